@@ -1,21 +1,45 @@
 import asyncio
+import hashlib
 import json
+import logging
 import os
 import sys
 import re
-import time
 import shutil
+import sqlite3
+import time
 from datetime import datetime, timezone
 from pathlib import Path
-from dotenv import load_dotenv
+from typing import AsyncIterator
 
+import aiohttp
 import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
 
-# Optional import for Discord. If it is not installed, Discord step will be skipped.
+# Optional fast JSON backend. Falls back to the stdlib json module.
 try:
-    import discord
+    import orjson
 except ImportError:
-    discord = None
+    orjson = None
+
+# Optional incremental JSON parser for large Steam responses.
+try:
+    import ijson
+except ImportError:
+    ijson = None
+
+# Optional C-backed HTML parser for Steam browse pages. Falls back to regex.
+try:
+    from selectolax.parser import HTMLParser
+except ImportError:
+    HTMLParser = None
+
+# Optional linear-time regex engine for scanning Steam HTML. Falls back to re.
+try:
+    import re2 as _re_engine
+except ImportError:
+    _re_engine = re
 
 # --------------------------------------------------------------------
 # Paths and config
@@ -24,13 +48,24 @@ except ImportError:
 ROOT = Path(__file__).resolve().parent.parent
 DATA_DIR = ROOT / "data"
 
-load_dotenv(ROOT / ".env")
+if (ROOT / ".env").exists():
+    from dotenv import load_dotenv
+    load_dotenv(ROOT / ".env")
 
 AIRPORTS_PATH = DATA_DIR / "airports.json"
 
 CACHE_DIR = ROOT / "cache" / "aerodatabox"
 CACHE_DIR.mkdir(parents=True, exist_ok=True)
 
+# Per-thread results from the last Discord scrape, used to skip unchanged
+# threads. Kept out of data/ (which is published) and persisted in CI via
+# actions/cache.
+DISCORD_STATE_PATH = ROOT / "cache" / "discord_state.json"
+
+# AeroDataBox response cache, opened on first use by _get_cache_db()
+CACHE_DB_PATH = CACHE_DIR / "cache.sqlite"
+_cache_db: sqlite3.Connection | None = None
+
 # Steam browse URL (most recent, ready-to-use items for appid 3239550)
 STEAM_BROWSE_BASE_URL = (
     "https://steamcommunity.com/workshop/browse/"
@@ -42,11 +77,40 @@ STEAM_API_URL = (
     "GetPublishedFileDetails/v1/"
 )
 
+# Shared keep-alive session for the synchronous HTTP calls
+_SESSION = requests.Session()
+_SESSION.headers.update({"User-Agent": "atc-airport-updater"})
+_SESSION.mount(
+    "https://",
+    HTTPAdapter(
+        pool_connections=10,
+        pool_maxsize=20,
+        max_retries=Retry(
+            total=3,
+            backoff_factor=0.3,
+            status_forcelist=[429, 500, 502, 503, 504],
+            # GetPublishedFileDetails is a read, so retrying the POST is safe
+            allowed_methods=frozenset({"GET", "POST"}),
+        ),
+    ),
+)
+
 # AeroDataBox via RAPIDAPI
 RAPIDAPI_BASE_URL = "https://aerodatabox.p.rapidapi.com"
 RAPIDAPI_API_KEY = os.environ.get("RAPIDAPI_API_KEY")
 RAPIDAPI_HOST = "aerodatabox.p.rapidapi.com"
 
+# Built once; shared by every AeroDataBox request
+_ADB_HEADERS = {
+    "x-rapidapi-key": RAPIDAPI_API_KEY or "",
+    "x-rapidapi-host": RAPIDAPI_HOST,
+    "Accept": "application/json"
+}
+_ADB_PARAMS = {
+    "withRunways": "false",
+    "withTime": "false"
+}
+
 
 # Discord
 DISCORD_BOT_TOKEN = os.environ.get("DISCORD_BOT_TOKEN")
@@ -54,10 +118,34 @@ DISCORD_BOT_TOKEN = os.environ.get("DISCORD_BOT_TOKEN")
 # For your link https://discord.com/channels/1312377412251680858/1401508715756126309
 # the channel id is 1401508715756126309
 DISCORD_CHANNEL_ID = os.environ.get("DISCORD_CHANNEL_ID")
+# Opt-in: read starter message content when a thread title has no ICAO.
+# Costs one extra REST call per such thread and needs the privileged intent.
+DISCORD_MESSAGE_CONTENT = (
+    os.environ.get("DISCORD_MESSAGE_CONTENT", "").lower() in ("1", "true", "yes")
+)
 
-ICAO_EXCLUSIONS = {
-    "WANT", "TEST", "DEMO", "SAMPLE", "EXAMPLE", "DUMMY", "FAKE", "WITH", "REAL", "GAME", "REAL", "PTFS", "ATCG", "MSFS", "MAKE", "OVER"
-}
+ICAO_EXCLUSIONS = frozenset({
+    "WANT", "TEST", "DEMO", "SAMPLE", "EXAMPLE", "DUMMY", "FAKE", "WITH", "REAL", "GAME", "PTFS", "ATCG", "MSFS", "MAKE", "OVER"
+})
+
+# Compiled once; used for every Steam title, Discord thread and browse page
+# Matches either case so callers never need to upper() the whole text
+_ICAO_RE = re.compile(r"\b([A-Za-z]{4})\b")
+_WID_RE = _re_engine.compile(r"filedetails/\?id=(\d+)")
+_ID_RE = re.compile(r"id=(\d+)")
+
+# Logs go to stdout so they interleave with the print() summaries in CI output
+_LOG_LEVEL = os.environ.get("LOG_LEVEL", "INFO").upper()
+if not isinstance(logging.getLevelName(_LOG_LEVEL), int):
+    # An unknown level name would make basicConfig raise at import
+    _LOG_LEVEL = "INFO"
+
+logging.basicConfig(
+    level=_LOG_LEVEL,
+    format="[%(levelname)s] %(message)s",
+    stream=sys.stdout,
+)
+log = logging.getLogger("updater")
 
 
 # --------------------------------------------------------------------
@@ -68,57 +156,83 @@ def check_json_exists(path: Path = AIRPORTS_PATH):
     DATA_DIR.mkdir(parents=True, exist_ok=True)
 
     if path.exists():
-        print("[INFO] airports.json exists. Continuing.")
+        log.info("airports.json exists. Continuing.")
         return
     
     base_path = DATA_DIR / "baseAirports.json"
     if not base_path.exists() and not path.exists():
-        print("[ERROR] baseAirports.json does not exist in data/. Cannot create airports.json")
+        log.error("baseAirports.json does not exist in data/. Cannot create airports.json")
         sys.exit(1)
 
-    print("[ERROR] airports.json does not exist in data/. Creating.")
+    log.error("airports.json does not exist in data/. Creating.")
     shutil.copyfile(base_path, path)
-    print("[INFO] Created airports.json from baseAirports.json.")
+    log.info("Created airports.json from baseAirports.json.")
         
 
+def json_loads(raw: bytes):
+    if orjson is not None:
+        return orjson.loads(raw)
+    return json.loads(raw)
+
+
+def json_dumps(data, indent=False) -> bytes:
+    """
+    Serialize to UTF-8 bytes. With indent=True the output is 2-space
+    indented with a trailing newline (the airports.json format).
+    """
+    if orjson is not None:
+        option = orjson.OPT_INDENT_2 | orjson.OPT_APPEND_NEWLINE if indent else 0
+        return orjson.dumps(data, option=option)
+    if indent:
+        return (json.dumps(data, indent=2, ensure_ascii=False) + "\n").encode("utf-8")
+    return json.dumps(data, ensure_ascii=False).encode("utf-8")
+
+
 def read_json(path: Path, fallback):
     if not path.exists():
-        print(f"[WARN] {path} does not exist, using fallback.")
+        log.warning("%s does not exist, using fallback.", path)
         return fallback
     try:
-        return json.loads(path.read_text(encoding="utf-8"))
+        return json_loads(path.read_bytes())
     except Exception as e:
-        print(f"[WARN] Failed to read {path}: {e}. Using fallback.")
+        log.warning("Failed to read %s: %s. Using fallback.", path, e)
         return fallback
 
 
 def write_json(path: Path, data):
-    text = json.dumps(data, indent=2)
-    path.write_text(text + "\n", encoding="utf-8")
+    """
+    Write data as indented JSON via a temp file and rename, so a crash
+    never leaves a half-written file behind.
+    """
+    tmp = path.with_suffix(".json.tmp")
+    if orjson is not None:
+        tmp.write_bytes(json_dumps(data, indent=True))
+    else:
+        # Stream to the file instead of building the whole string first
+        with open(tmp, "w", encoding="utf-8") as f:
+            json.dump(data, f, indent=2, ensure_ascii=False)
+            f.write("\n")
+    os.replace(tmp, path)
 
 
 def to_iso_timestamp(unix_seconds):
     if not unix_seconds:
         return None
-    return datetime.fromtimestamp(unix_seconds, tz=timezone.utc).isoformat()
+    # Same output as datetime.fromtimestamp(..., tz=utc).isoformat() for
+    # whole seconds, without building a datetime per call
+    return time.strftime("%Y-%m-%dT%H:%M:%S+00:00", time.gmtime(unix_seconds))
 
 
 def extract_icao_from_text(text: str) -> str | None:
     """
     Try to find a 4-letter ICAO code in text.
-    Returns the first valid 4-letter uppercase token.
+    Returns the first valid 4-letter token, uppercased.
     """
     if not text:
         return None
-    
-    text = text.upper()
-    matches = re.findall(r"\b([A-Z]{4})\b", text)
 
-
-    for code in matches:
-        if code not in ICAO_EXCLUSIONS:
-            return code
-    return None
+    matches = (m.group(1).upper() for m in _ICAO_RE.finditer(text))
+    return next((code for code in matches if code not in ICAO_EXCLUSIONS), None)
 
 
 # --------------------------------------------------------------------
@@ -132,6 +246,7 @@ def load_airports_state():
       - base_airports (status == 'base')
       - non_base_airports
       - existing_icaos (uppercase set)
+      - by_source (source -> non-base entries, e.g. by_source["discord"])
     """
     airports_data = read_json(
         AIRPORTS_PATH,
@@ -143,101 +258,202 @@ def load_airports_state():
     if not isinstance(all_airports, list):
         all_airports = []
 
-    base_airports = [
-        a for a in all_airports
-        if (a.get("status") == "base") and a.get("icao")
-    ]
-    non_base_airports = [
-        a for a in all_airports
-        if (a.get("status") != "base") and a.get("icao")
-    ]
+    base_airports: list[dict] = []
+    non_base_airports: list[dict] = []
+    existing_icaos: set[str] = set()
+    by_source: dict[str, list[dict]] = {"discord": [], "steam": []}
 
-    existing_icaos = {
-        (a.get("icao") or "").upper()
-        for a in all_airports
-        if a.get("icao")
-    }
+    for a in all_airports:
+        icao = a.get("icao")
+        if not icao:
+            continue
+        existing_icaos.add(icao.upper())
+        if a.get("status") == "base":
+            base_airports.append(a)
+        else:
+            non_base_airports.append(a)
+            by_source.setdefault(a.get("source") or "", []).append(a)
 
-    print(
-        f"[INFO] Loaded {len(base_airports)} base + "
-        f"{len(non_base_airports)} non-base airports "
-        f"(unique ICAOs: {len(existing_icaos)})."
+    log.info(
+        "Loaded %s base + %s non-base airports (unique ICAOs: %s).",
+        len(base_airports), len(non_base_airports), len(existing_icaos),
     )
 
-    return schema_version, base_airports, non_base_airports, existing_icaos
+    return (
+        schema_version,
+        base_airports,
+        non_base_airports,
+        existing_icaos,
+        by_source,
+    )
 
 
 # --------------------------------------------------------------------
 # Steam scraping
 # --------------------------------------------------------------------
 
-def fetch_workshop_ids_from_browse(max_pages=None):
+STEAM_PAGE_WINDOW = 8
+STEAM_MAX_RETRIES = 3
+STEAM_MAX_PAUSE_S = 60.0
+
+
+def _extract_workshop_ids(html: str) -> list[str]:
     """
-    Scrape the Steam browse pages for workshop IDs.
+    Return the workshop IDs linked from a Steam browse page, in page order.
 
-    If max_pages is None, continue until a page has no items,
-    with a safety cap.
+    Uses the item anchors when selectolax is installed, and the plain
+    regex scan otherwise (or if the page layout no longer matches).
     """
-    ids: list[str] = []
-    seen: set[str] = set()
+    if HTMLParser is not None:
+        ids = []
+        for node in HTMLParser(html).css("div.workshopItem a.ugc"):
+            wid = node.attributes.get("data-publishedfileid")
+            if not wid:
+                m = _ID_RE.search(node.attributes.get("href") or "")
+                wid = m.group(1) if m else None
+            if wid:
+                ids.append(wid)
+        if ids:
+            return ids
 
-    page = 1
+    return _WID_RE.findall(html)
+
+
+async def _fetch_pages_async(max_pages=None, concurrency=4):
+    """
+    Scrape the Steam browse pages for workshop IDs concurrently.
+
+    Pages are fetched in windows of STEAM_PAGE_WINDOW and scanned in page
+    order; the first empty page ends the scrape, so at most one window is
+    fetched past the last page with items.
+    """
     safety_cap = 50
+    last_page = safety_cap if max_pages is None else min(max_pages, safety_cap)
+
+    sem = asyncio.Semaphore(concurrency)
+    timeout = aiohttp.ClientTimeout(total=20)
+    connector = aiohttp.TCPConnector(limit_per_host=concurrency)
+
+    # Ordered set: dict keys dedupe while keeping first-seen order
+    seen: dict[str, None] = {}
+
+    async with aiohttp.ClientSession(timeout=timeout, connector=connector) as session:
+        async def get(page: int) -> str:
+            url = f"{STEAM_BROWSE_BASE_URL}&p={page}"
+            async with sem:
+                for attempt in range(STEAM_MAX_RETRIES + 1):
+                    log.debug("Fetching Steam browse page: %s", url)
+                    async with session.get(url) as resp:
+                        retryable = resp.status == 429 or resp.status >= 500
+                        if not retryable or attempt >= STEAM_MAX_RETRIES:
+                            resp.raise_for_status()
+                            return await resp.text()
+                        try:
+                            delay = float(resp.headers["Retry-After"])
+                        except (KeyError, ValueError):
+                            delay = 2 ** attempt
+                        status = resp.status
+
+                    # Sleep after the response is released, but while holding
+                    # the semaphore so every page slows down
+                    delay = min(max(delay, 0.0), STEAM_MAX_PAUSE_S)
+                    log.warning(
+                        "Steam returned HTTP %s for page %s, retrying in %.0fs",
+                        status, page, delay,
+                    )
+                    await asyncio.sleep(delay)
+            raise RuntimeError(f"Steam browse page {page} could not be fetched")
+
+        page = 1
+        reached_end = False
+        while page <= last_page and not reached_end:
+            window = range(page, min(page + STEAM_PAGE_WINDOW, last_page + 1))
+            tasks = [asyncio.create_task(get(p)) for p in window]
+            try:
+                # Consume pages in order. A failure before the first empty
+                # page aborts the scrape; pages after it are cancelled.
+                for p, task in zip(window, tasks):
+                    found = _extract_workshop_ids(await task)
+                    if not found:
+                        log.info("No workshop items on page %s, stopping.", p)
+                        reached_end = True
+                        break
+                    log.info("Page %s: found %s ids.", p, len(found))
+                    for wid in found:
+                        seen[wid] = None
+            finally:
+                for task in tasks:
+                    task.cancel()
+                # Reap cancelled/failed speculative pages so their errors
+                # are not reported as unretrieved
+                await asyncio.gather(*tasks, return_exceptions=True)
 
-    while True:
-        if max_pages is not None and page > max_pages:
-            break
-        if page > safety_cap:
-            print(f"[WARN] Reached safety page cap {safety_cap}.")
-            break
-
-        url = f"{STEAM_BROWSE_BASE_URL}&p={page}"
-        print(f"[INFO] Fetching Steam browse page: {url}")
-        resp = requests.get(url, timeout=20)
-        resp.raise_for_status()
-        html = resp.text
-
-        found = re.findall(r"filedetails/\?id=(\d+)", html)
-        if not found:
-            print(f"[INFO] No workshop items on page {page}, stopping.")
-            break
-
-        new_count = 0
-        for wid in found:
-            if wid not in seen:
-                seen.add(wid)
-                ids.append(wid)
-                new_count += 1
+            page = window.stop
+
+    if not reached_end and (max_pages is None or max_pages > safety_cap):
+        log.warning("Reached safety page cap %s.", safety_cap)
+
+    return list(seen)
 
-        print(
-            f"[INFO] Page {page}: found {len(found)} ids, "
-            f"{new_count} new (total {len(ids)})."
+
+def fetch_workshop_ids_from_browse(**kwargs):
+    """Synchronous wrapper around _fetch_pages_async."""
+    return asyncio.run(_fetch_pages_async(**kwargs))
+
+
+def _iter_published_file_details(resp: requests.Response):
+    """
+    Yield each entry of response.publishedfiledetails from a streamed
+    response, parsing incrementally with ijson when it is installed.
+    """
+    if ijson is not None:
+        resp.raw.decode_content = True
+        yield from ijson.items(
+            resp.raw, "response.publishedfiledetails.item", use_float=True
         )
+        return
 
-        page += 1
-        time.sleep(1.0)
+    data = json_loads(resp.content)
+    yield from data.get("response", {}).get("publishedfiledetails", []) or []
 
-    return ids
 
+def fetch_workshop_details_bulk(ids: list[str], batch=100) -> dict[str, dict]:
+    """
+    Fetch Steam details for many workshop IDs, `batch` IDs per POST.
 
-def fetch_workshop_details(workshop_id: str) -> dict:
-    payload = {
-        "itemcount": 1,
-        "publishedfileids[0]": workshop_id,
-    }
+    Returns:
+      dict[workshop_id] -> details dict
+    """
+    details_by_id: dict[str, dict] = {}
 
-    print(f"[INFO] Fetching Steam details for {workshop_id}...")
-    resp = requests.post(STEAM_API_URL, data=payload, timeout=20)
-    resp.raise_for_status()
-    data = resp.json()
+    for start in range(0, len(ids), batch):
+        chunk = ids[start:start + batch]
+        payload = {
+            "itemcount": len(chunk),
+            **{f"publishedfileids[{i}]": wid for i, wid in enumerate(chunk)},
+        }
 
-    details_list = (
-        data.get("response", {}).get("publishedfiledetails", []) or []
-    )
-    if not details_list:
-        raise RuntimeError(f"No details returned for workshop {workshop_id}")
+        log.info(
+            "Fetching Steam details for %s items (%s-%s of %s)...",
+            len(chunk), start + 1, start + len(chunk), len(ids),
+        )
+        try:
+            with _SESSION.post(
+                STEAM_API_URL, data=payload, timeout=30, stream=True
+            ) as resp:
+                resp.raise_for_status()
+                for details in _iter_published_file_details(resp):
+                    wid = str(details.get("publishedfileid") or "")
+                    # result != 1 means the item is hidden, deleted or private
+                    if not wid or details.get("result") != 1:
+                        log.debug("No usable Steam details for %s", wid or "<unknown>")
+                        continue
+                    details_by_id[wid] = details
+        except Exception as e:
+            log.error("Steam details failed for batch at %s: %s", start, e)
+            continue
 
-    return details_list[0]
+    return details_by_id
 
 
 def fetch_steam_airports(existing_icaos: set[str]) -> dict[str, dict]:
@@ -250,13 +466,14 @@ def fetch_steam_airports(existing_icaos: set[str]) -> dict[str, dict]:
     """
     steam_by_icao: dict[str, dict] = {}
     workshop_ids = fetch_workshop_ids_from_browse(max_pages=None)
-    print(f"[INFO] Total workshop IDs fetched: {len(workshop_ids)}")
+    log.info("Total workshop IDs fetched: %s", len(workshop_ids))
+
+    details_by_id = fetch_workshop_details_bulk(workshop_ids)
 
     for wid in workshop_ids:
-        try:
-            details = fetch_workshop_details(wid)
-        except Exception as e:
-            print(f"[ERROR] Steam details failed for {wid}: {e}")
+        details = details_by_id.get(wid)
+        if details is None:
+            log.warning("No Steam details returned for %s, skipping.", wid)
             continue
 
         title = details.get("title") or ""
@@ -266,7 +483,7 @@ def fetch_steam_airports(existing_icaos: set[str]) -> dict[str, dict]:
 
         icao = extract_icao_from_text(title)
         if not icao:
-            print(f"[WARN] Could not parse ICAO from title '{title}', skipping.")
+            log.warning("Could not parse ICAO from title '%s', skipping.", title)
             continue
         icao = icao.upper()
 
@@ -279,15 +496,16 @@ def fetch_steam_airports(existing_icaos: set[str]) -> dict[str, dict]:
             )
             steam_by_icao[icao] = {
                 "icao": icao,
+                "source": "steam",
                 "title": title,
                 "creator": creator,
                 "time_updated": time_updated,
                 "workshop_url": workshop_url,
                 "subscriptions": subscriptions
             }
-            print(
-                f"[INFO] Steam candidate {icao} updated to workshop {wid} "
-                f"(time_updated={time_updated})."
+            log.debug(
+                "Steam candidate %s updated to workshop %s (time_updated=%s).",
+                icao, wid, time_updated,
             )
 
     # Filter out ICAOs already present in airports.json
@@ -299,9 +517,9 @@ def fetch_steam_airports(existing_icaos: set[str]) -> dict[str, dict]:
         if icao not in existing_icaos
     }
 
-    print(
-        f"[INFO] Steam airports: {len(steam_all)} ICAOs scraped, "
-        f"{len(steam_new)} are new (not in airports.json)."
+    log.info(
+        "Steam airports: %s ICAOs scraped, %s are new (not in airports.json).",
+        len(steam_all), len(steam_new),
     )
     return steam_all, steam_new
 
@@ -311,32 +529,40 @@ def fetch_steam_airports(existing_icaos: set[str]) -> dict[str, dict]:
 # Discord scraping
 # --------------------------------------------------------------------
 
-async def _fetch_discord_airports_async(channel_id: int) -> dict[str, dict]:
+async def _fetch_discord_airports_async(
+    channel_id: int, thread_state: dict
+) -> tuple[dict[str, dict], dict[str, dict]]:
     """
     Scrape ICAO codes from a Discord forum/text channel's threads.
 
-    Returns:
-      { "KJFK": {"icao":"KJFK","source":"discord","discord_thread":url,"author":name,"updated_ts":int_ts}, ... }
+    thread_state maps thread id -> {"last_message_id", "title_hash", "entry"}
+    from the previous run.
+
+    Returns (result, next_thread_state):
+      result = { "KJFK": {"icao":"KJFK","source":"discord","discord_thread":url,"author":name,"updated_ts":int_ts}, ... }
+      next_thread_state only holds threads seen in this run
 
     Key robustness features:
-      - Uses thread.last_message_id first (fast) to get last activity timestamp
+      - Decodes the last activity timestamp from thread.last_message_id (no request)
       - Falls back to history(limit=1) with a hard timeout
       - Starter message fetch is optional and timeout-protected
       - Concurrency limited to avoid rate limit stalls
       - Supports forum channels (active + archived threads)
+      - Skips threads unchanged since the previous run (thread_state)
     """
-    if discord is None:
-        raise RuntimeError("discord.py is not available")
-
-    # Optional: define this at module level instead
-    DISCORD_ICAO_EXCLUDE = {
-        "WANT",
-    }
+    # Imported lazily: discord.py is heavy and only needed for this step.
+    # If it is not installed, the Discord step is skipped.
+    try:
+        import discord
+    except ImportError:
+        log.info("discord.py is not installed, skipping Discord fetch.")
+        return {}, {}
 
     result: dict[str, dict] = {}
+    next_thread_state: dict[str, dict] = {}
 
     # Tune these if you have lots of threads
-    CONCURRENCY = 8
+    CONCURRENCY = 16
     FETCH_TIMEOUT_S = 8
 
     sem = asyncio.Semaphore(CONCURRENCY)
@@ -344,7 +570,7 @@ async def _fetch_discord_airports_async(channel_id: int) -> dict[str, dict]:
     intents = discord.Intents.default()
     # Only enable if you actually need to parse starter message content
     # (still works without it via thread titles)
-    intents.message_content = True
+    intents.message_content = DISCORD_MESSAGE_CONTENT
 
     done = asyncio.Event()
 
@@ -365,12 +591,12 @@ async def _fetch_discord_airports_async(channel_id: int) -> dict[str, dict]:
         return await _safe_wait_for(thread.fetch_message(thread.id))
 
     async def _fetch_last_message_ts(thread: "discord.Thread") -> int:
-        # 1) Fast path: last_message_id -> fetch that message
+        # 1) Fast path: last_message_id is a snowflake, which encodes its
+        #    creation time, so no request is needed
         try:
-            if getattr(thread, "last_message_id", None):
-                msg = await _safe_wait_for(thread.fetch_message(thread.last_message_id))
-                if msg is not None and getattr(msg, "created_at", None):
-                    return int(msg.created_at.timestamp())
+            last_message_id = getattr(thread, "last_message_id", None)
+            if last_message_id:
+                return int(discord.utils.snowflake_time(int(last_message_id)).timestamp())
         except Exception:
             pass
 
@@ -394,87 +620,119 @@ async def _fetch_discord_airports_async(channel_id: int) -> dict[str, dict]:
 
         return 0
 
+    def _merge(entry: dict | None) -> None:
+        # No await between the compare and the write, so concurrent
+        # threads cannot interleave here; no lock is needed.
+        if entry is None:
+            return
+        existing = result.get(entry["icao"])
+        if existing is None or entry["updated_ts"] > existing.get("updated_ts", 0):
+            result[entry["icao"]] = entry
+
+    async def _scrape_thread(thread: "discord.Thread") -> dict | None:
+        # 1) Try title first
+        title = thread.name or ""
+        icao = extract_icao_from_text(title)
+        starter = None
+
+        # 2) Fallback to starter message content, but only when the title
+        #    has no 4-letter token at all; a title whose tokens are all
+        #    excluded words is not worth a REST call.
+        if not icao and intents.message_content and not _ICAO_RE.search(title):
+            starter = await _fetch_starter_message(thread)
+            if starter is not None:
+                icao = extract_icao_from_text(getattr(starter, "content", "") or "")
+
+        if not icao:
+            return None
+
+        icao = icao.upper()
+
+        if thread.guild is None:
+            return None
+
+        # Author name preference: thread.owner -> starter.author -> Unknown
+        author_name = "Unknown"
+        owner = getattr(thread, "owner", None)
+        if owner is not None and getattr(owner, "name", None):
+            author_name = owner.name
+        else:
+            # Reading a message's author does not need the message_content
+            # intent, so this fallback runs regardless of that setting.
+            if starter is None:
+                starter = await _fetch_starter_message(thread)
+            if starter is not None and getattr(starter, "author", None) is not None:
+                author_name = getattr(starter.author, "name", None) or str(starter.author)
+
+        updated_ts = await _fetch_last_message_ts(thread)
+
+        return {
+            "icao": icao,
+            "source": "discord",
+            "discord_thread": _thread_url(thread),
+            "author": author_name,
+            "updated_ts": updated_ts,
+        }
+
     async def _process_thread(thread: "discord.Thread") -> None:
+        # Threads with no new messages and an unchanged title since the
+        # previous run reuse their stored result instead of hitting the API.
+        key = str(thread.id)
+        last_message_id = getattr(thread, "last_message_id", None)
+        title_hash = hashlib.sha256((thread.name or "").encode("utf-8")).hexdigest()[:16]
+        previous = thread_state.get(key)
+        if (
+            previous is not None
+            and last_message_id
+            and previous.get("last_message_id") == last_message_id
+            and previous.get("title_hash") == title_hash
+        ):
+            next_thread_state[key] = previous
+            _merge(previous.get("entry"))
+            return
+
         async with sem:
             try:
-                # 1) Try title first
-                icao = extract_icao_from_text(thread.name or "")
-                starter = None
-
-                # 2) Fallback to starter message content
-                if not icao and intents.message_content:
-                    starter = await _fetch_starter_message(thread)
-                    if starter is not None:
-                        icao = extract_icao_from_text(getattr(starter, "content", "") or "")
-
-                if not icao:
-                    return
-
-                icao = icao.upper()
-                if icao in DISCORD_ICAO_EXCLUDE:
-                    return
-
-                if thread.guild is None:
-                    return
-
-                # Author name preference: thread.owner -> starter.author -> Unknown
-                author_name = "Unknown"
-                owner = getattr(thread, "owner", None)
-                if owner is not None and getattr(owner, "name", None):
-                    author_name = owner.name
-                else:
-                    if starter is None and intents.message_content:
-                        starter = await _fetch_starter_message(thread)
-                    if starter is not None and getattr(starter, "author", None) is not None:
-                        author_name = getattr(starter.author, "name", None) or str(starter.author)
-
-                updated_ts = await _fetch_last_message_ts(thread)
-
-                existing = result.get(icao)
-                if existing is None or updated_ts > existing.get("updated_ts", 0):
-                    result[icao] = {
-                        "icao": icao,
-                        "source": "discord",
-                        "discord_thread": _thread_url(thread),
-                        "author": author_name,
-                        "updated_ts": updated_ts,
-                    }
-
+                entry = await _scrape_thread(thread)
             except Exception:
                 # Swallow per-thread errors so one bad thread doesn't stall the whole scrape
                 return
 
-    async def _gather_threads(channel) -> list["discord.Thread"]:
-        threads: list["discord.Thread"] = []
+        next_thread_state[key] = {
+            "last_message_id": last_message_id,
+            "title_hash": title_hash,
+            "entry": entry,
+        }
+        _merge(entry)
 
+    async def _iter_threads(channel) -> AsyncIterator["discord.Thread"]:
         # Forum channel: has active threads in .threads, archived via .archived_threads()
         if hasattr(channel, "threads"):
             try:
-                threads.extend(list(channel.threads))
+                for th in list(channel.threads):
+                    yield th
             except Exception:
                 pass
 
-            # Archived threads (public)
+            # Archived threads (public), yielded as each page arrives
             try:
-                archived_iter = channel.archived_threads(limit=None)
-                async for th in archived_iter:
-                    threads.append(th)
+                async for th in channel.archived_threads(limit=None):
+                    yield th
             except Exception:
                 pass
 
-            return threads
+            return
 
         # Text channel: try active threads if present
         if hasattr(channel, "active_threads"):
             try:
                 ths = await channel.active_threads()
                 if isinstance(ths, (list, tuple)):
-                    threads.extend(ths)
+                    for th in ths:
+                        yield th
             except Exception:
                 pass
 
-        return threads
-
     class _Client(discord.Client):
         async def on_ready(self):
             try:
@@ -482,10 +740,12 @@ async def _fetch_discord_airports_async(channel_id: int) -> dict[str, dict]:
                 if channel is None:
                     channel = await self.fetch_channel(channel_id)
 
-                threads = await _gather_threads(channel)
-
-                # Process threads with concurrency limit
-                tasks = [asyncio.create_task(_process_thread(th)) for th in threads]
+                # Start processing each thread as soon as it is listed, so
+                # archive pagination overlaps with the per-thread fetches
+                # (concurrency is limited inside _process_thread)
+                tasks = []
+                async for th in _iter_threads(channel):
+                    tasks.append(asyncio.create_task(_process_thread(th)))
                 if tasks:
                     await asyncio.gather(*tasks, return_exceptions=True)
 
@@ -499,34 +759,50 @@ async def _fetch_discord_airports_async(channel_id: int) -> dict[str, dict]:
     await client.start(DISCORD_BOT_TOKEN)
     await done.wait()
 
-    return result
+    return result, next_thread_state
 
 
 def fetch_discord_airports(existing_icaos: set[str],
-                           steam_icaos: set[str]) -> tuple[dict[str, dict], dict[str, dict]]:
+                           steam_icaos: set[str],
+                           save_state: bool = True) -> tuple[dict[str, dict], dict[str, dict]]:
     """
     Returns (discord_all, discord_new)
 
+    With save_state=False (dry runs) the thread state is read but not written.
+
     discord_new is filtered to:
       - not already in airports.json
       - not present in Steam results (Steam wins)
     """
     if not DISCORD_CHANNEL_ID:
-        print("[INFO] DISCORD_CHANNEL_ID not set, skipping Discord fetch.")
+        log.info("DISCORD_CHANNEL_ID not set, skipping Discord fetch.")
         return {}, {}
 
     try:
         channel_id = int(DISCORD_CHANNEL_ID)
     except ValueError:
-        print(f"[ERROR] DISCORD_CHANNEL_ID={DISCORD_CHANNEL_ID} is not a valid int.")
+        log.error("DISCORD_CHANNEL_ID=%s is not a valid int.", DISCORD_CHANNEL_ID)
         return {}, {}
 
-    if discord is None or not DISCORD_BOT_TOKEN:
-        print("[INFO] Discord library or token missing, skipping Discord fetch.")
+    if not DISCORD_BOT_TOKEN:
+        log.info("DISCORD_BOT_TOKEN not set, skipping Discord fetch.")
         return {}, {}
 
-    print(f"[INFO] Fetching airports from Discord channel {channel_id}...")
-    discord_all = asyncio.run(_fetch_discord_airports_async(channel_id))
+    log.info("Fetching airports from Discord channel %s...", channel_id)
+    # Results depend on the channel and on whether starter messages are read,
+    # so state saved under different settings is discarded.
+    state_key = {"channelId": channel_id, "messageContent": DISCORD_MESSAGE_CONTENT}
+    state = read_json(DISCORD_STATE_PATH, {}) if DISCORD_STATE_PATH.exists() else {}
+    if state.get("key") != state_key:
+        state = {}
+
+    discord_all, threads = asyncio.run(
+        _fetch_discord_airports_async(channel_id, state.get("threads") or {})
+    )
+
+    if save_state:
+        DISCORD_STATE_PATH.parent.mkdir(parents=True, exist_ok=True)
+        write_json(DISCORD_STATE_PATH, {"key": state_key, "threads": threads})
 
     discord_new = {
         icao: info
@@ -534,86 +810,301 @@ def fetch_discord_airports(existing_icaos: set[str],
         if icao not in existing_icaos and icao not in steam_icaos
     }
 
-    print(
-        f"[INFO] Discord airports: {len(discord_all)} ICAOs scraped, "
-        f"{len(discord_new)} are new (not in airports.json or Steam)."
+    log.info(
+        "Discord airports: %s ICAOs scraped, %s are new (not in airports.json or Steam).",
+        len(discord_all), len(discord_new),
     )
     return discord_all, discord_new
 
 
 
 def cache_path_for_icao(icao: str) -> Path:
-    """Return the cache file path for a given ICAO."""
+    """Return the legacy per-ICAO cache file path (pre-SQLite cache)."""
     icao = icao.upper()
     return CACHE_DIR / f"{icao}.json"
 
 
-def load_cached_airport(icao: str) -> dict | None:
-    """Load cached AeroDataBox response for an ICAO if present."""
+def _get_cache_db() -> sqlite3.Connection:
+    """Open the AeroDataBox cache database on first use, one row per ICAO."""
+    global _cache_db
+    if _cache_db is not None:
+        return _cache_db
+
+    db = sqlite3.connect(CACHE_DB_PATH)
+    db.execute("PRAGMA journal_mode=WAL")
+    db.execute("PRAGMA synchronous=NORMAL")
+    db.execute(
+        "CREATE TABLE IF NOT EXISTS adb (icao TEXT PRIMARY KEY, json BLOB, ts INTEGER, "
+        "etag TEXT, last_modified TEXT)"
+    )
+    # Caches created before ETag support lack the validator columns
+    columns = {row[1] for row in db.execute("PRAGMA table_info(adb)")}
+    for column in ("etag", "last_modified"):
+        if column not in columns:
+            db.execute(f"ALTER TABLE adb ADD COLUMN {column} TEXT")
+    _cache_db = db
+    return db
+
+
+def load_cached_entry(icao: str) -> dict | None:
+    """
+    Load the cached AeroDataBox entry for an ICAO if present:
+      {"body": response, "etag": str | None, "last_modified": str | None}
+    """
+    icao = icao.upper()
+    try:
+        row = _get_cache_db().execute(
+            "SELECT json, etag, last_modified FROM adb WHERE icao = ?", (icao,)
+        ).fetchone()
+        if row:
+            return {
+                "body": json_loads(row[0]),
+                "etag": row[1],
+                "last_modified": row[2],
+            }
+    except Exception as e:
+        log.warning("Failed to read cache for %s: %s", icao, e)
+        return None
+
+    # One-time migration from the old one-file-per-ICAO cache
     path = cache_path_for_icao(icao)
     if not path.exists():
         return None
     try:
-        return json.loads(path.read_text(encoding="utf-8"))
+        data = json_loads(path.read_bytes())
     except Exception as e:
-        print(f"[WARN] Failed to read cache for {icao}: {e}")
+        log.warning("Failed to read cache for %s: %s", icao, e)
         return None
+    save_cached_airport(icao, data)
+    path.unlink(missing_ok=True)
+    return {"body": data, "etag": None, "last_modified": None}
 
 
-def save_cached_airport(icao: str, data: dict) -> None:
-    """Save AeroDataBox response for an ICAO to cache."""
-    path = cache_path_for_icao(icao)
+def save_cached_airports(entries: dict[str, dict]) -> None:
+    """
+    Save many AeroDataBox entries ({"body", "etag", "last_modified"} per
+    ICAO) to cache in a single transaction.
+    """
+    now = int(time.time())
+    rows = [
+        (icao.upper(), json_dumps(entry["body"]), now,
+         entry.get("etag"), entry.get("last_modified"))
+        for icao, entry in entries.items()
+    ]
     try:
-        path.write_text(json.dumps(data), encoding="utf-8")
+        db = _get_cache_db()
+        with db:
+            db.executemany(
+                "INSERT OR REPLACE INTO adb (icao, json, ts, etag, last_modified) "
+                "VALUES (?, ?, ?, ?, ?)",
+                rows,
+            )
     except Exception as e:
-        print(f"[WARN] Failed to write cache for {icao}: {e}")
+        log.warning("Failed to write cache for %s ICAOs: %s", len(rows), e)
+
+
+def save_cached_airport(icao: str, data: dict,
+                        etag: str | None = None,
+                        last_modified: str | None = None) -> None:
+    """Save AeroDataBox response (and its HTTP validators) for an ICAO to cache."""
+    save_cached_airports(
+        {icao: {"body": data, "etag": etag, "last_modified": last_modified}}
+    )
 
 # --------------------------------------------------------------------
 # AeroDataBox lookup
 # --------------------------------------------------------------------
 
-def fetch_airport_from_aerodatabox(icao: str) -> dict:
-    if not RAPIDAPI_API_KEY:
-        raise RuntimeError("RAPIDAPI_API_KEY is not set.")
+ADB_MAX_RETRIES = 4
+ADB_MAX_PAUSE_S = 60.0
 
-    cached = load_cached_airport(icao)
-    if cached:
-        print(f"[INFO] Using cached data for {icao}")
-        return cached
 
+class AeroDataBoxQuotaExceeded(RuntimeError):
+    pass
+
+
+class _RateLimiter:
+    """
+    Shared pause gate for AeroDataBox requests. When a response says to
+    slow down for a short while (Retry-After, or a rate window that resets
+    within ADB_MAX_PAUSE_S), every request waits. A longer wait means the
+    plan quota is used up, and every remaining request fails immediately.
+    """
+
+    def __init__(self):
+        self._resume_at = 0.0
+        self.exhausted = False
+
+    async def wait(self) -> None:
+        if self.exhausted:
+            raise AeroDataBoxQuotaExceeded("AeroDataBox quota exhausted")
+        delay = self._resume_at - time.monotonic()
+        if delay > 0:
+            await asyncio.sleep(delay)
+
+    def pause(self, seconds: float) -> None:
+        seconds = min(max(seconds, 0.0), ADB_MAX_PAUSE_S)
+        self._resume_at = max(self._resume_at, time.monotonic() + seconds)
+
+    def _pause_or_exhaust(self, seconds: float) -> None:
+        if seconds > ADB_MAX_PAUSE_S:
+            self.exhausted = True
+        else:
+            self.pause(seconds)
+
+    def update(self, headers) -> None:
+        retry_after = headers.get("Retry-After")
+        if retry_after:
+            try:
+                self._pause_or_exhaust(float(retry_after))
+            except ValueError:
+                pass
+
+        # RapidAPI's X-RateLimit-Requests-* headers track the plan quota;
+        # their reset is the time until the billing period ends.
+        remaining = (
+            headers.get("X-RateLimit-Remaining")
+            or headers.get("X-RateLimit-Requests-Remaining")
+        )
+        if remaining == "0":
+            reset = (
+                headers.get("X-RateLimit-Reset")
+                or headers.get("X-RateLimit-Requests-Reset")
+            )
+            try:
+                self._pause_or_exhaust(float(reset) if reset else 1.0)
+            except ValueError:
+                self.pause(1.0)
+
+
+async def fetch_airport_from_aerodatabox(
+    session: aiohttp.ClientSession,
+    sem: asyncio.Semaphore,
+    limiter: _RateLimiter,
+    icao: str,
+    cached: dict | None = None,
+) -> dict | None:
+    """
+    Fetch one ICAO. If a cached entry is given, the request is made
+    conditional on its ETag/Last-Modified and a 304 returns it unchanged.
+
+    Returns:
+      {"body": response, "etag": ..., "last_modified": ...} or None
+    """
     url = f"{RAPIDAPI_BASE_URL}/airports/icao/{icao}"
 
-    headers = {
-        "x-rapidapi-key": RAPIDAPI_API_KEY,
-        "x-rapidapi-host": RAPIDAPI_HOST,
-        "Accept": "application/json"
-    }
+    headers = {}
+    if cached:
+        if cached.get("etag"):
+            headers["If-None-Match"] = cached["etag"]
+        if cached.get("last_modified"):
+            headers["If-Modified-Since"] = cached["last_modified"]
 
-    params = {
-        "withRunways": "false",
-        "withTime": "false"
-    }
+    async with sem:
+        for attempt in range(ADB_MAX_RETRIES + 1):
+            await limiter.wait()
+            log.info("Fetching %s from RapidAPI...", icao)
+            backoff = 0.5 * 2 ** attempt
 
-    print(f"[INFO] Fetching {icao} from RapidAPI...")
+            try:
+                async with session.get(url, params=_ADB_PARAMS, headers=headers) as response:
+                    limiter.update(response.headers)
+
+                    if response.status == 304 and cached:
+                        log.debug("%s not modified, keeping cached data", icao)
+                        return cached
+
+                    if response.status == 429 or response.status >= 500:
+                        if limiter.exhausted:
+                            raise AeroDataBoxQuotaExceeded(
+                                "AeroDataBox quota exhausted"
+                            )
+                        if attempt < ADB_MAX_RETRIES:
+                            log.warning(
+                                "%s: HTTP %s, retrying in %.1fs",
+                                icao, response.status, backoff,
+                            )
+                            limiter.pause(backoff)
+                            continue
+
+                    if response.status != 200:
+                        log.error("Failed for %s: %s", icao, response.status)
+                        log.error("%s", await response.text())
+                        return None
+
+                    return {
+                        "body": json_loads(await response.read()),
+                        "etag": response.headers.get("ETag"),
+                        "last_modified": response.headers.get("Last-Modified"),
+                    }
 
-    response = requests.get(url, headers=headers, params=params, timeout=20)
+            except (aiohttp.ClientError, asyncio.TimeoutError) as e:
+                if attempt >= ADB_MAX_RETRIES:
+                    raise
+                # str() of a timeout is empty, so log the type as well
+                log.warning("%s: %r, retrying in %.1fs", icao, e, backoff)
+                await asyncio.sleep(backoff)
 
-    # Proper error handling (you didn’t have this before)
-    if response.status_code != 200:
-        print(f"[ERROR] Failed for {icao}: {response.status_code}")
-        print(response.text)
-        return None
+    return None
 
-    data = response.json()
-    save_cached_airport(icao, data)
-    return data
+
+async def _fetch_adb_async(icaos: list[str], cached: dict[str, dict] | None = None,
+                           concurrency=8) -> dict:
+    """
+    Resolve many ICAOs against AeroDataBox concurrently. The cache is
+    not read here; callers pass only the ICAOs that need fetching, plus
+    any cached entries to revalidate with conditional requests.
+    Successful responses are cached once all requests have finished, so
+    no cache I/O runs on the event loop.
+
+    Returns:
+      dict[icao] -> AeroDataBox response, None, or the raised exception
+    """
+    if not RAPIDAPI_API_KEY:
+        raise RuntimeError("RAPIDAPI_API_KEY is not set.")
+
+    sem = asyncio.Semaphore(concurrency)
+    limiter = _RateLimiter()
+    timeout = aiohttp.ClientTimeout(total=20)
+    connector = aiohttp.TCPConnector(limit_per_host=concurrency)
+
+    async with aiohttp.ClientSession(
+        headers=_ADB_HEADERS, timeout=timeout, connector=connector
+    ) as session:
+        tasks = [
+            asyncio.create_task(
+                fetch_airport_from_aerodatabox(
+                    session, sem, limiter, icao, (cached or {}).get(icao)
+                )
+            )
+            for icao in icaos
+        ]
+        results = await asyncio.gather(*tasks, return_exceptions=True)
+
+    if limiter.exhausted:
+        log.error("AeroDataBox quota exhausted; remaining lookups were skipped.")
+
+    adb_results = {}
+    fetched: dict[str, dict] = {}
+    for icao, entry in zip(icaos, results):
+        if isinstance(entry, dict):
+            fetched[icao] = entry
+            adb_results[icao] = entry["body"]
+        else:
+            adb_results[icao] = entry
+
+    if fetched:
+        save_cached_airports(fetched)
+
+    return adb_results
 
 
 # --------------------------------------------------------------------
 # Orchestrator
 # --------------------------------------------------------------------
 
-def main(run_steam=True, run_discord=True, use_aerodatabox=True):
+def main(run_steam=True, run_discord=True, use_aerodatabox=True,
+         refresh_cache=False):
     check_json_exists()
     """
     Master pipeline:
@@ -630,24 +1121,25 @@ def main(run_steam=True, run_discord=True, use_aerodatabox=True):
         base_airports,
         non_base_airports,
         existing_icaos,
+        by_source,
     ) = load_airports_state()
 
     # Step 1 - Steam
     if run_steam == True:
         steam_all, steam_new = fetch_steam_airports(existing_icaos)
         steam_icaos = set(steam_new.keys())
-        print(f"Steam Scraped. Found {len(steam_icaos)} new ICAOs.")
+        log.info("Steam Scraped. Found %s new ICAOs.", len(steam_icaos))
     else:
-        print("Steam Skipped.")
+        log.info("Steam Skipped.")
         steam_new = {}
         steam_icaos = set()
 
     # Step 2 - Discord (Steam wins on conflicts)
     if run_discord == True:
         discord_all, discord_new = fetch_discord_airports(existing_icaos, steam_icaos)
-        print(f"Discord Scraped. Found {len(discord_new)} new ICAOs.")
+        log.info("Discord Scraped. Found %s new ICAOs.", len(discord_new))
     else:
-        print("Discord Skipped.")
+        log.info("Discord Skipped.")
         discord_new = {}
         discord_all = {}
 
@@ -655,52 +1147,71 @@ def main(run_steam=True, run_discord=True, use_aerodatabox=True):
     if run_discord:
         updated_existing = 0
 
-        for a in non_base_airports:
-            if a.get("source") == "discord" and a.get("icao"):
-                icao = a["icao"].upper()
-                info = discord_all.get(icao)
+        for a in by_source["discord"]:
+            info = discord_all.get(a["icao"].upper())
 
-                if info and info.get("updated_ts"):
-                    new_iso = to_iso_timestamp(info["updated_ts"])
-                    if new_iso and new_iso != a.get("lastUpdated"):
-                        a["lastUpdated"] = new_iso
-                        updated_existing += 1
+            if info and info.get("updated_ts"):
+                new_iso = to_iso_timestamp(info["updated_ts"])
+                if new_iso and new_iso != a.get("lastUpdated"):
+                    a["lastUpdated"] = new_iso
+                    updated_existing += 1
 
         if updated_existing:
-            print(f"[INFO] Updated lastUpdated for {updated_existing} existing Discord airports.")
+            log.info(
+                "Updated lastUpdated for %s existing Discord airports.",
+                updated_existing,
+            )
   
     # Step 3 - all new ICAOs that we need to call AeroDataBox for
-    new_all: dict[str, dict] = {}
-    for icao, info in steam_new.items():
-        info = dict(info)
-        info["source"] = "steam"
-        new_all[icao] = info
-
-    for icao, info in discord_new.items():
-        info = dict(info)
-        info["source"] = "discord"
-        new_all[icao] = info
-
-    print(
-        f"[INFO] Total new ICAOs requiring AeroDataBox lookup: {len(new_all)}"
-    )
+    # Entries are already tagged with their source; Steam wins on conflicts
+    new_all: dict[str, dict] = {**discord_new, **steam_new}
+
+    log.info("Total new ICAOs requiring AeroDataBox lookup: %s", len(new_all))
 
     new_airports: list[dict] = []
 
+    adb_results: dict = {}
+    if use_aerodatabox == True and new_all:
+        to_fetch: list[str] = []
+        # With --refresh-cache, cached entries are revalidated rather than
+        # trusted, using conditional requests.
+        to_revalidate: dict[str, dict] = {}
+        for icao in sorted(new_all):
+            entry = load_cached_entry(icao)
+            if entry and not refresh_cache:
+                log.debug("Using cached data for %s", icao)
+                adb_results[icao] = entry["body"]
+                continue
+            to_fetch.append(icao)
+            if entry:
+                to_revalidate[icao] = entry
+
+        log.info(
+            "AeroDataBox: %s cached, %s to fetch.",
+            len(adb_results), len(to_fetch),
+        )
+        if to_fetch:
+            try:
+                adb_results.update(asyncio.run(_fetch_adb_async(to_fetch, to_revalidate)))
+            except Exception as e:
+                log.error("AeroDataBox lookup failed: %s", e)
+
+    # One timestamp for the whole run
+    now_iso = datetime.now(timezone.utc).isoformat()
+
     for icao, info in sorted(new_all.items(), key=lambda kv: kv[0]):
         if use_aerodatabox == False:
-            print(
-                f"[WARN] Skipping AeroDataBox for {icao} because "
-                "use_aerodatabox=False."
+            log.warning(
+                "Skipping AeroDataBox for %s because use_aerodatabox=False.",
+                icao,
             )
             continue
 
-        try:
-            adb = fetch_airport_from_aerodatabox(icao)
-            if not adb:
-                continue
-        except Exception as e:
-            print(f"[ERROR] AeroDataBox failed for {icao}: {e}")
+        adb = adb_results.get(icao)
+        if isinstance(adb, Exception):
+            log.error("AeroDataBox failed for %s: %s", icao, adb)
+            continue
+        if not adb:
             continue
 
         full_name = (
@@ -717,7 +1228,7 @@ def main(run_steam=True, run_discord=True, use_aerodatabox=True):
         lat = location.get("lat")
         lng = location.get("lon") or location.get("lng")
         if lat is None or lng is None:
-            print(f"[WARN] No lat/lng from AeroDataBox for {icao}, skipping.")
+            log.warning("No lat/lng from AeroDataBox for %s, skipping.", icao)
             continue
 
         country = adb.get("country") or {}
@@ -728,8 +1239,6 @@ def main(run_steam=True, run_discord=True, use_aerodatabox=True):
         continent_code = continent.get("code")
         continent_name = continent.get("name")
 
-        now_iso = datetime.now(timezone.utc).isoformat()
-
         if info["source"] == "steam":
             status = "released"
             author = info.get("creator", "Unknown")
@@ -765,14 +1274,11 @@ def main(run_steam=True, run_discord=True, use_aerodatabox=True):
 
         new_airports.append(airport_entry)
         existing_icaos.add(icao)
-        print(
-            f"[INFO] Added new {info['source']} airport: {icao} - {name}"
-        )
-
-        # Protect API rate limits a bit
-        time.sleep(0.5)
+        log.info("Added new %s airport: %s - %s", info["source"], icao, name)
 
     # Step 4 - merge and sort non-base airports
+    # list.sort (Timsort) detects the two pre-sorted runs and merges them
+    # in linear time, so no manual merge is needed.
     combined_non_base = non_base_airports + new_airports
     combined_non_base.sort(
         key=lambda a: (a.get("icao") or "").upper()
@@ -780,37 +1286,46 @@ def main(run_steam=True, run_discord=True, use_aerodatabox=True):
 
     merged_airports = base_airports + combined_non_base
 
-    now_iso = datetime.now(timezone.utc).isoformat()
-    updated_data = {
-        "schemaVersion": schema_version,
-        "lastUpdated": now_iso,
-        "airports": merged_airports,
-    }
+    # lastUpdated changes every run, so compare the payload rather than bytes
+    previous = read_json(AIRPORTS_PATH, {}) if AIRPORTS_PATH.exists() else {}
+    if (
+        previous.get("schemaVersion") == schema_version
+        and previous.get("airports") == merged_airports
+    ):
+        log.info("No changes to %s, skipping write.", AIRPORTS_PATH)
+    else:
+        updated_data = {
+            "schemaVersion": schema_version,
+            "lastUpdated": now_iso,
+            "airports": merged_airports,
+        }
 
-    DATA_DIR.mkdir(parents=True, exist_ok=True)
-    write_json(AIRPORTS_PATH, updated_data)
+        DATA_DIR.mkdir(parents=True, exist_ok=True)
+        write_json(AIRPORTS_PATH, updated_data)
 
-    print(
-        f"[INFO] Updated {AIRPORTS_PATH} with {len(merged_airports)} airports. "
-        f"lastUpdated={now_iso}"
-    )
+        log.info(
+            "Updated %s with %s airports. lastUpdated=%s",
+            AIRPORTS_PATH, len(merged_airports), now_iso,
+        )
 
      # Cleanup pycache
     pycache_dir = ROOT / "scripts" / "__pycache__"
     if pycache_dir.exists() and pycache_dir.is_dir():
         try:
             shutil.rmtree(pycache_dir)
-            print(f"[INFO] Removed {pycache_dir}")
+            log.info("Removed %s", pycache_dir)
         except Exception as e:
-            print(f"[WARN] Failed to remove {pycache_dir}: {e}")
+            log.warning("Failed to remove %s: %s", pycache_dir, e)
 
 
 if "--dry-detect" in sys.argv:
     check_json_exists()
-    schema_version, base_airports, non_base_airports, existing_icaos = load_airports_state()
+    schema_version, base_airports, non_base_airports, existing_icaos, _ = load_airports_state()
 
     steam_all, steam_new = fetch_steam_airports(existing_icaos)
-    discord_all, discord_new = fetch_discord_airports(existing_icaos, set(steam_new.keys()))
+    discord_all, discord_new = fetch_discord_airports(
+        existing_icaos, set(steam_new.keys()), save_state=False
+    )
 
     new_count = len(steam_new) + len(discord_new)
     print(f"Dry-detect new ICAOs: {new_count}")
@@ -822,4 +1337,4 @@ if "--dry-detect" in sys.argv:
     sys.exit(0)
 
 if __name__ == "__main__":
-    main(use_aerodatabox=True)
+    main(use_aerodatabox=True, refresh_cache="--refresh-cache" in sys.argv)